@@ -1,47 +1,104 @@
 import gradio as gr
 import os
+import asyncio
+import json
 from datetime import datetime, timedelta
 from agno.agent import Agent
 from agno.team import Team
+from agno.run.team import TeamRunEvent
 from agno.models.anthropic import Claude
 from agno.db.sqlite import SqliteDb
+from sqlalchemy import create_engine, event
 from agno.tools.duckduckgo import DuckDuckGoTools
-import sys
+from ddgs import DDGS
+import re
+import traceback
+import threading
+import time
+from string import Template
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
-# Global variable to store agent team
-agent_team = None
+# Shared pool for blocking yfinance fetches; never shut down from request code
+MARKET_DATA_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Full tracebacks are only formatted into error messages in debug mode
+DEBUG = bool(os.getenv("DEBUG"))
+
+# Optional Redis cache shared across worker processes (only when REDIS_HOST is set)
+redis = None
+REDIS = None
+if os.getenv("REDIS_HOST"):
+    try:
+        import redis
+        from redis.backoff import NoBackoff
+        from redis.retry import Retry as RedisRetry
+        # No retries: a missing cache must never slow down a fetch
+        REDIS = redis.Redis(
+            host=os.getenv("REDIS_HOST"),
+            socket_timeout=0.2,
+            socket_connect_timeout=0.2,
+            retry=RedisRetry(NoBackoff(), 0),
+        )
+        REDIS.ping()
+        print("Using Redis market data cache")
+    except ImportError:
+        print("Warning: REDIS_HOST is set but the redis package is not installed")
+    except redis.RedisError as e:
+        print(f"Warning: Redis unavailable, caching disabled: {str(e)}")
+        REDIS = None
+
+# Resolve the yfinance backend once - try yfinance-cache first, fallback to regular yfinance
+YF = None
+YF_IMPORT_ERROR = None
+try:
+    import yfc as YF  # yfinance-cache
+    print("Using yfinance-cache")
+except ImportError:
+    try:
+        import yfinance as YF
+        print("Using regular yfinance")
+    except ImportError as e:
+        YF_IMPORT_ERROR = str(e)
 
-def test_dependencies():
-    """Test if all dependencies are working"""
+def test_dependencies(live_checks=False):
+    """Test if all dependencies are working
+    
+    Parameters:
+    live_checks (bool): Also fetch AAPL history and probe network connectivity
+    """
     results = []
     
     # Test yfinance-cache
     try:
         import yfc as yf
         results.append("✅ yfinance-cache imported successfully")
-        try:
-            stock = yf.Ticker("AAPL")
-            hist = stock.history(period="5d")
-            if len(hist) > 0:
-                results.append(f"✅ yfinance-cache working - AAPL price: ${hist['Close'].iloc[-1]:.2f}")
-            else:
-                results.append("❌ yfinance-cache - no data returned")
-        except Exception as e:
-            results.append(f"❌ yfinance-cache fetch failed: {str(e)}")
-    except ImportError:
-        results.append("⚠️ yfinance-cache not installed, trying regular yfinance")
-        try:
-            import yfinance as yf
-            results.append("✅ yfinance imported successfully")
+        if live_checks:
             try:
                 stock = yf.Ticker("AAPL")
                 hist = stock.history(period="5d")
                 if len(hist) > 0:
-                    results.append(f"✅ yfinance working - AAPL price: ${hist['Close'].iloc[-1]:.2f}")
+                    results.append(f"✅ yfinance-cache working - AAPL price: ${hist['Close'].iloc[-1]:.2f}")
                 else:
-                    results.append("❌ yfinance - no data returned")
+                    results.append("❌ yfinance-cache - no data returned")
             except Exception as e:
-                results.append(f"❌ yfinance fetch failed: {str(e)}")
+                results.append(f"❌ yfinance-cache fetch failed: {str(e)}")
+    except ImportError:
+        results.append("⚠️ yfinance-cache not installed, trying regular yfinance")
+        try:
+            import yfinance as yf
+            results.append("✅ yfinance imported successfully")
+            if live_checks:
+                try:
+                    stock = yf.Ticker("AAPL")
+                    hist = stock.history(period="5d")
+                    if len(hist) > 0:
+                        results.append(f"✅ yfinance working - AAPL price: ${hist['Close'].iloc[-1]:.2f}")
+                    else:
+                        results.append("❌ yfinance - no data returned")
+                except Exception as e:
+                    results.append(f"❌ yfinance fetch failed: {str(e)}")
         except ImportError as e:
             results.append(f"❌ No yfinance package installed: {str(e)}")
     
@@ -63,54 +120,139 @@ def test_dependencies():
         results.append(f"❌ API key check failed: {str(e)}")
     
     # Test network
-    try:
-        import urllib.request
-        urllib.request.urlopen('https://www.google.com', timeout=5)
-        results.append("✅ Network connectivity OK")
-    except Exception as e:
-        results.append(f"❌ Network issue: {str(e)}")
+    if live_checks:
+        try:
+            import urllib.request
+            urllib.request.urlopen('https://www.google.com', timeout=5)
+            results.append("✅ Network connectivity OK")
+        except Exception as e:
+            results.append(f"❌ Network issue: {str(e)}")
     
     return "\n".join(results)
 
-print("=" * 60)
-print("DEPENDENCY CHECK")
-print("=" * 60)
-print(test_dependencies())
-print("=" * 60)
+def print_dependency_check():
+    """Print the dependency report (live checks only when RUN_DEPCHECK is set)"""
+    report = test_dependencies(live_checks=bool(os.getenv("RUN_DEPCHECK")))
+    print("=" * 60)
+    print("DEPENDENCY CHECK")
+    print("=" * 60)
+    print(report)
+    print("=" * 60)
+
+# Run the check in the background so it never delays startup
+threading.Thread(target=print_dependency_check, daemon=True).start()
+
+@lru_cache(maxsize=128)
+def _cached_info(ticker, hour_bucket):
+    """Fetch stock.info once per ticker per hour (hour_bucket acts as the TTL)"""
+    return YF.Ticker(ticker).info
+
+# Calendar days of history to fetch: enough for ~55 trading days (SMA-50 plus a margin)
+HISTORY_LOOKBACK_DAYS = 80
+
+# Cheap sanity check so obviously invalid input never hits the network
+TICKER_PATTERN = re.compile(r'^\^?[A-Z0-9][A-Z0-9.=\-]{0,14}$')
+
+# Markdown layout for each ticker's market data block ($$ is a literal dollar sign)
+MARKET_SUMMARY_TEMPLATE = Template("""
+## 📈 TECHNICAL & FUNDAMENTAL DATA: $ticker
+
+### 🏢 COMPANY INFO
+- **Name:** $long_name
+- **Sector:** $sector
+- **Industry:** $industry
+
+### 💰 CURRENT PRICE METRICS
+- **Current Price:** $$$current_price
+- **52-Week High:** $$$high_52w
+- **52-Week Low:** $$$low_52w
+- **50-Day Average:** $$$avg_50d
+- **200-Day Average:** $$$avg_200d
+
+### 📊 PRICE PERFORMANCE
+- **7-Day Change:** $change_7d%
+- **30-Day Change:** $change_30d%
+- **Average Daily Return:** $avg_daily_return%
+- **Daily Volatility:** $volatility%
+
+### 📉 TECHNICAL INDICATORS
+- **10-Day SMA:** $sma_10
+- **20-Day SMA:** $sma_20
+- **50-Day SMA:** $sma_50
+- **Trend:** $trend
+
+### 📦 VOLUME ANALYSIS
+- **Average Volume:** $avg_volume
+- **Recent Volume (5d avg):** $recent_volume
+- **Volume Trend:** $volume_trend
+- **Beta:** $beta
+
+### 💼 VALUATION RATIOS
+- **Market Cap:** $market_cap
+- **P/E Ratio (Trailing):** $trailing_pe
+- **Forward P/E:** $forward_pe
+- **PEG Ratio:** $peg_ratio
+- **Price to Book:** $price_to_book
+
+### 💵 DIVIDEND INFORMATION
+- **Dividend Yield:** $div_yield
+- **Dividend Rate:** $$$div_rate
+- **Payout Ratio:** $payout_ratio
+
+### 🎯 ANALYST CONSENSUS
+- **Recommendation:** $recommendation
+- **Target Price:** $$$target_price
+- **Number of Analysts:** $num_analysts
+
+### 📊 TECHNICAL SUMMARY
+**Price Position:** $price_position (30-day: $change_30d%)
+**Momentum:** $momentum
+**Volatility Level:** $volatility_level
+**Overall Technical Signal:** $trend
+
+---
+""")
+
+def _format_sma(sma, current_price):
+    """Format an SMA value with the price's position relative to it"""
+    if not sma:
+        return "N/A "
+    return f"${sma:.2f} {'✅ Above' if current_price > sma else '⚠️ Below'}"
 
-def get_market_data(ticker, period="3mo"):
+def get_market_data(ticker, lookback_days=HISTORY_LOOKBACK_DAYS):
     """
     Get comprehensive technical and fundamental data using yfinance with caching
     
     Parameters:
     ticker (str): Stock ticker symbol
-    period (str): Data period (1mo, 3mo, 6mo, 1y, etc.)
+    lookback_days (int): Calendar days of daily history to fetch
     """
     try:
-        # Import check - try yfinance-cache first, fallback to regular yfinance
-        try:
-            import yfc as yf  # yfinance-cache
-            print(f"Using yfinance-cache for {ticker}")
-        except ImportError:
-            try:
-                import yfinance as yf
-                print(f"Using regular yfinance for {ticker}")
-            except ImportError as e:
-                return f"❌ Import Error: {str(e)}\n\nPlease ensure 'yfinance-cache' is in your requirements.txt file.", None
+        if YF is None:
+            return f"❌ Import Error: {YF_IMPORT_ERROR}\n\nPlease ensure 'yfinance-cache' is in your requirements.txt file.", None
         
-        try:
-            import pandas as pd
-            from time import sleep
-        except ImportError as e:
-            return f"❌ Import Error: {str(e)}", None
+        if not TICKER_PATTERN.match(ticker):
+            return f"❌ Invalid ticker format: {ticker}", None
+        
+        # Check the shared cache first (keyed per hour so entries roll over)
+        cache_key = f"md:{ticker}:{lookback_days}:{int(time.time() // 3600)}"
+        if REDIS is not None:
+            try:
+                cached = REDIS.get(cache_key)
+                if cached:
+                    market_summary, data = json.loads(cached)
+                    return market_summary, data
+            except (redis.RedisError, ValueError):
+                pass
         
         # Fetch data with yfinance-cache (automatically handles caching and retries)
         try:
             print(f"Fetching data for {ticker}...")
-            stock = yf.Ticker(ticker)
+            stock = YF.Ticker(ticker)
             
             # Get historical data
-            hist = stock.history(period=period)
+            start = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+            hist = stock.history(start=start)
             
             if hist is None or len(hist) == 0:
                 return f"❌ No data available for {ticker}. Please verify the ticker symbol is correct.", None
@@ -123,43 +265,44 @@ def get_market_data(ticker, period="3mo"):
         # Get stock info with error handling
         info = {}
         try:
-            info = stock.info
+            info = _cached_info(ticker, int(time.time() // 3600))
             print(f"Successfully fetched info for {ticker}")
         except Exception as e:
             print(f"Warning: Could not fetch detailed info for {ticker}: {str(e)}")
             # Continue with just historical data
             info = {}
         
-        # Calculate technical indicators
-        hist['SMA_10'] = hist['Close'].rolling(window=10).mean()
-        hist['SMA_20'] = hist['Close'].rolling(window=20).mean()
-        hist['SMA_50'] = hist['Close'].rolling(window=50).mean()
-        hist['Daily_Return'] = hist['Close'].pct_change() * 100
+        # Work on plain NumPy arrays rather than pandas Series, skipping missing bars
+        close = hist['Close'].dropna().to_numpy()
+        volume = hist['Volume'].dropna().to_numpy()
+        if len(close) == 0:
+            return f"❌ No data available for {ticker}. Please verify the ticker symbol is correct.", None
+        log_return_pct = np.diff(np.log(close)) * 100
         
-        # Current metrics
-        current_price = hist['Close'].iloc[-1]
-        sma_10 = hist['SMA_10'].iloc[-1] if not pd.isna(hist['SMA_10'].iloc[-1]) else None
-        sma_20 = hist['SMA_20'].iloc[-1] if not pd.isna(hist['SMA_20'].iloc[-1]) else None
-        sma_50 = hist['SMA_50'].iloc[-1] if not pd.isna(hist['SMA_50'].iloc[-1]) else None
+        # Current metrics (only the latest SMA values are used)
+        current_price = close[-1]
+        sma_10 = close[-10:].mean() if len(close) >= 10 else None
+        sma_20 = close[-20:].mean() if len(close) >= 20 else None
+        sma_50 = close[-50:].mean() if len(close) >= 50 else None
         
-        # Volatility
-        volatility = hist['Daily_Return'].std()
-        avg_daily_return = hist['Daily_Return'].mean()
+        # Volatility from daily log returns (sample std)
+        volatility = log_return_pct.std(ddof=1)
+        avg_daily_return = log_return_pct.mean()
         
         # Price changes
-        if len(hist) >= 7:
-            change_7d = ((hist['Close'].iloc[-1] - hist['Close'].iloc[-7]) / hist['Close'].iloc[-7]) * 100
+        if len(close) >= 7:
+            change_7d = ((close[-1] - close[-7]) / close[-7]) * 100
         else:
             change_7d = 0
         
-        if len(hist) >= 30:
-            change_30d = ((hist['Close'].iloc[-1] - hist['Close'].iloc[-30]) / hist['Close'].iloc[-30]) * 100
+        if len(close) >= 30:
+            change_30d = ((close[-1] - close[-30]) / close[-30]) * 100
         else:
-            change_30d = ((hist['Close'].iloc[-1] - hist['Close'].iloc[0]) / hist['Close'].iloc[0]) * 100
+            change_30d = ((close[-1] - close[0]) / close[0]) * 100
         
         # Volume analysis
-        avg_volume = hist['Volume'].mean()
-        recent_volume = hist['Volume'].iloc[-5:].mean()  # Last 5 days
+        avg_volume = volume.mean()
+        recent_volume = volume[-5:].mean()  # Last 5 days
         volume_trend = "Increasing" if recent_volume > avg_volume * 1.1 else "Decreasing" if recent_volume < avg_volume * 0.9 else "Stable"
         
         # Trend analysis
@@ -177,81 +320,66 @@ def get_market_data(ticker, period="3mo"):
         else:
             trend = "Insufficient data"
         
+        # Look up fields used more than once a single time
+        market_cap = info.get('marketCap')
+        dividend_yield = info.get('dividendYield')
+        recommendation_key = info.get('recommendationKey')
+        trailing_pe = info.get('trailingPE', 'N/A')
+        
         # Safely format market cap
         market_cap_str = "N/A"
-        if info.get('marketCap'):
+        if market_cap:
             try:
-                market_cap_str = f"${info.get('marketCap'):,}"
+                market_cap_str = f"${market_cap:,}"
             except:
-                market_cap_str = str(info.get('marketCap'))
+                market_cap_str = str(market_cap)
         
         # Safely format dividend yield
         div_yield_str = "N/A"
-        if info.get('dividendYield'):
+        if dividend_yield:
             try:
-                div_yield_str = f"{info.get('dividendYield') * 100:.2f}%"
+                div_yield_str = f"{dividend_yield * 100:.2f}%"
             except:
-                div_yield_str = str(info.get('dividendYield'))
+                div_yield_str = str(dividend_yield)
         
         # Build comprehensive summary with safe formatting
-        market_summary = f"""
-## 📈 TECHNICAL & FUNDAMENTAL DATA: {ticker}
-
-### 🏢 COMPANY INFO
-- **Name:** {info.get('longName', 'N/A')}
-- **Sector:** {info.get('sector', 'N/A')}
-- **Industry:** {info.get('industry', 'N/A')}
-
-### 💰 CURRENT PRICE METRICS
-- **Current Price:** ${current_price:.2f}
-- **52-Week High:** ${info.get('fiftyTwoWeekHigh', 'N/A')}
-- **52-Week Low:** ${info.get('fiftyTwoWeekLow', 'N/A')}
-- **50-Day Average:** ${info.get('fiftyDayAverage', 'N/A')}
-- **200-Day Average:** ${info.get('twoHundredDayAverage', 'N/A')}
-
-### 📊 PRICE PERFORMANCE
-- **7-Day Change:** {change_7d:+.2f}%
-- **30-Day Change:** {change_30d:+.2f}%
-- **Average Daily Return:** {avg_daily_return:+.2f}%
-- **Daily Volatility:** {volatility:.2f}%
-
-### 📉 TECHNICAL INDICATORS
-- **10-Day SMA:** {"$" + f"{sma_10:.2f}" if sma_10 else "N/A"} {('✅ Above' if current_price > sma_10 else '⚠️ Below') if sma_10 else ""}
-- **20-Day SMA:** {"$" + f"{sma_20:.2f}" if sma_20 else "N/A"} {('✅ Above' if current_price > sma_20 else '⚠️ Below') if sma_20 else ""}
-- **50-Day SMA:** {"$" + f"{sma_50:.2f}" if sma_50 else "N/A"} {('✅ Above' if current_price > sma_50 else '⚠️ Below') if sma_50 else ""}
-- **Trend:** {trend}
-
-### 📦 VOLUME ANALYSIS
-- **Average Volume:** {avg_volume:,.0f}
-- **Recent Volume (5d avg):** {recent_volume:,.0f}
-- **Volume Trend:** {volume_trend}
-- **Beta:** {info.get('beta', 'N/A')}
-
-### 💼 VALUATION RATIOS
-- **Market Cap:** {market_cap_str}
-- **P/E Ratio (Trailing):** {info.get('trailingPE', 'N/A')}
-- **Forward P/E:** {info.get('forwardPE', 'N/A')}
-- **PEG Ratio:** {info.get('pegRatio', 'N/A')}
-- **Price to Book:** {info.get('priceToBook', 'N/A')}
-
-### 💵 DIVIDEND INFORMATION
-- **Dividend Yield:** {div_yield_str}
-- **Dividend Rate:** ${info.get('dividendRate', 'N/A')}
-- **Payout Ratio:** {info.get('payoutRatio', 'N/A')}
-
-### 🎯 ANALYST CONSENSUS
-- **Recommendation:** {info.get('recommendationKey', 'N/A').upper() if info.get('recommendationKey') else 'N/A'}
-- **Target Price:** ${info.get('targetMeanPrice', 'N/A')}
-- **Number of Analysts:** {info.get('numberOfAnalystOpinions', 'N/A')}
-
-### 📊 TECHNICAL SUMMARY
-**Price Position:** {'Bullish' if change_30d > 5 else 'Bearish' if change_30d < -5 else 'Neutral'} (30-day: {change_30d:+.2f}%)
-**Momentum:** {'Strong' if abs(avg_daily_return) > 1 else 'Moderate' if abs(avg_daily_return) > 0.3 else 'Weak'}
-**Volatility Level:** {'High' if volatility > 3 else 'Moderate' if volatility > 1.5 else 'Low'}
-**Overall Technical Signal:** {trend}
-
----
-"""
+        market_summary = MARKET_SUMMARY_TEMPLATE.substitute(
+            ticker=ticker,
+            long_name=info.get('longName', 'N/A'),
+            sector=info.get('sector', 'N/A'),
+            industry=info.get('industry', 'N/A'),
+            current_price=f"{current_price:.2f}",
+            high_52w=info.get('fiftyTwoWeekHigh', 'N/A'),
+            low_52w=info.get('fiftyTwoWeekLow', 'N/A'),
+            avg_50d=info.get('fiftyDayAverage', 'N/A'),
+            avg_200d=info.get('twoHundredDayAverage', 'N/A'),
+            change_7d=f"{change_7d:+.2f}",
+            change_30d=f"{change_30d:+.2f}",
+            avg_daily_return=f"{avg_daily_return:+.2f}",
+            volatility=f"{volatility:.2f}",
+            sma_10=_format_sma(sma_10, current_price),
+            sma_20=_format_sma(sma_20, current_price),
+            sma_50=_format_sma(sma_50, current_price),
+            trend=trend,
+            avg_volume=f"{avg_volume:,.0f}",
+            recent_volume=f"{recent_volume:,.0f}",
+            volume_trend=volume_trend,
+            beta=info.get('beta', 'N/A'),
+            market_cap=market_cap_str,
+            trailing_pe=trailing_pe,
+            forward_pe=info.get('forwardPE', 'N/A'),
+            peg_ratio=info.get('pegRatio', 'N/A'),
+            price_to_book=info.get('priceToBook', 'N/A'),
+            div_yield=div_yield_str,
+            div_rate=info.get('dividendRate', 'N/A'),
+            payout_ratio=info.get('payoutRatio', 'N/A'),
+            recommendation=recommendation_key.upper() if recommendation_key else 'N/A',
+            target_price=info.get('targetMeanPrice', 'N/A'),
+            num_analysts=info.get('numberOfAnalystOpinions', 'N/A'),
+            price_position='Bullish' if change_30d > 5 else 'Bearish' if change_30d < -5 else 'Neutral',
+            momentum='Strong' if abs(avg_daily_return) > 1 else 'Moderate' if abs(avg_daily_return) > 0.3 else 'Weak',
+            volatility_level='High' if volatility > 3 else 'Moderate' if volatility > 1.5 else 'Low',
+        )
         
         # Store structured data
         data = {
@@ -262,38 +390,103 @@ def get_market_data(ticker, period="3mo"):
             'trend': trend,
             'volatility': volatility,
             'volume_trend': volume_trend,
-            'analyst_rating': info.get('recommendationKey', 'N/A'),
-            'market_cap': info.get('marketCap', 'N/A'),
-            'pe_ratio': info.get('trailingPE', 'N/A'),
+            'analyst_rating': recommendation_key or 'N/A',
+            'market_cap': market_cap or 'N/A',
+            'pe_ratio': trailing_pe,
         }
         
+        if REDIS is not None:
+            try:
+                REDIS.setex(cache_key, 3600, json.dumps([market_summary, data]))
+            except (redis.RedisError, TypeError, ValueError):
+                pass
+        
         return market_summary, data
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        return f"❌ Unexpected error fetching data for {ticker}:\n\n{str(e)}\n\nDetails:\n{error_details}", None
+        error_details = f"\n\nDetails:\n{traceback.format_exc()}" if DEBUG else ""
+        return f"❌ Unexpected error fetching data for {ticker}:\n\n{str(e)}{error_details}", None
 
-def initialize_agents():
-    """Initialize the sentiment analysis agent team"""
-    global agent_team
+class PooledDuckDuckGoTools(DuckDuckGoTools):
+    """DuckDuckGoTools that reuses one DDGS client (and its HTTP connections) across searches"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # DDGS keeps its search engines - and their HTTP clients - cached per instance
+        self.ddgs = DDGS(proxy=self.proxy, timeout=self.timeout, verify=self.verify_ssl)
+    
+    def _search_kwargs(self, query, max_results):
+        search_kwargs = {
+            "query": query,
+            "max_results": self.fixed_max_results or max_results,
+            "backend": self.backend,
+        }
+        if self.timelimit is not None:
+            search_kwargs["timelimit"] = self.timelimit
+        if self.region is not None:
+            search_kwargs["region"] = self.region
+        return search_kwargs
     
-    if agent_team is not None:
-        return agent_team
+    def web_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search the web for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The search results from the web.
+        """
+        search_query = f"{self.modifier} {query}" if self.modifier else query
+        results = self.ddgs.text(**self._search_kwargs(search_query, max_results))
+        return json.dumps(results, indent=2, ensure_ascii=False)
+    
+    def search_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from the web.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from the web.
+        """
+        results = self.ddgs.news(**self._search_kwargs(query, max_results))
+        return json.dumps(results, indent=2, ensure_ascii=False)
+
+def create_sqlite_engine(db_file):
+    """Create a pooled SQLite engine with WAL journaling for agent history writes"""
+    engine = create_engine(
+        f"sqlite:///{db_file}",
+        connect_args={"check_same_thread": False},
+    )
     
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    
+    return engine
+
+def initialize_agents():
+    """Initialize the sentiment analysis agent team"""
     api_key = os.getenv("ANTHROPIC_API_KEY")
     
     if not api_key:
         raise ValueError("ANTHROPIC_API_KEY not found. Please set it in Hugging Face Spaces secrets.")
     
-    db = SqliteDb(db_file="sentiment_agents.db")
+    # One pooled engine shared by both agents
+    db = SqliteDb(db_engine=create_sqlite_engine("sentiment_agents.db"))
     
     # Agent 1: News Collector
     news_collector = Agent(
         name="News Reliability Analyst",
         role="Collect and verify news from reliable financial sources only",
-        model=Claude(id="claude-sonnet-4-20250514", api_key=api_key),
-        tools=[DuckDuckGoTools()],
+        model=Claude(id="claude-haiku-4-5-20251001", api_key=api_key),
+        tools=[PooledDuckDuckGoTools()],
         instructions=[
             "You are a news reliability specialist. Your PRIMARY task is to collect and present news ONLY from highly credible sources.",
             "",
@@ -309,7 +502,7 @@ def initialize_agents():
             "- Promotional content, advertorials, or sponsored posts",
             "",
             "**Your Process:**",
-            "1. For EACH stock, search for recent news (last 30 days)",
+            "1. For EACH stock, search for recent news (last 30 days) - issue the searches for all stocks together in one step rather than one stock at a time",
             "2. Verify EVERY source against the approved list above",
             "3. Present findings in a clear, structured format",
             "",
@@ -453,7 +646,7 @@ def initialize_agents():
     )
     
     # Team Lead
-    agent_team = Team(
+    team = Team(
         name="Portfolio Sentiment Analysis Team",
         model=Claude(id="claude-sonnet-4-20250514", api_key=api_key),
         members=[news_collector, sentiment_scorer],
@@ -475,38 +668,52 @@ def initialize_agents():
         markdown=True,
     )
     
-    return agent_team
+    return team
 
-def analyze_portfolio(portfolio_text):
-    """Analyze portfolio sentiment"""
+async def analyze_portfolio(portfolio_text):
+    """Analyze portfolio sentiment, yielding the report as it streams in"""
     try:
-        # Initialize agents if needed
-        team = initialize_agents()
+        # Agents are built once at startup
+        if agent_team is None:
+            yield f"❌ **Error:** {agent_init_error}\n\nPlease check your API key, then restart the app."
+            return
+        team = agent_team
         
         # Parse tickers
         if not portfolio_text or not portfolio_text.strip():
-            return "❌ Please enter at least one stock ticker."
+            yield "❌ Please enter at least one stock ticker."
+            return
         
-        tickers = [t.strip().upper() for t in portfolio_text.replace('\n', ',').split(',') if t.strip()]
+        tickers = [t for t in re.split(r'[,;\s]+', portfolio_text.upper()) if t]
         
         if not tickers:
-            return "❌ Please enter valid stock tickers."
+            yield "❌ Please enter valid stock tickers."
+            return
         
         # Fetch market data for all stocks
-        market_data_summary = "# Market Data from YFinance\n\n"
+        summary_parts = ["# Market Data from YFinance\n\n"]
         all_data = {}
         errors = []
         
-        for ticker in tickers:
-            data_text, data_dict = get_market_data(ticker)
+        # Fetch tickers concurrently - yfinance calls are network-bound
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(MARKET_DATA_EXECUTOR, get_market_data, ticker) for ticker in tickers)
+        )
+        
+        for ticker, (data_text, data_dict) in zip(tickers, results):
             if data_dict is None:
                 errors.append(f"- {ticker}: Failed to fetch data")
-            market_data_summary += data_text + "\n---\n\n"
+            summary_parts.append(data_text)
+            summary_parts.append("\n---\n\n")
             all_data[ticker] = data_dict
         
+        market_data_summary = "".join(summary_parts)
+        
         # If all tickers failed, return error
         if len(errors) == len(tickers):
-            return f"❌ **All tickers failed to fetch data:**\n\n" + "\n".join(errors) + "\n\n**Please check:**\n- Ticker symbols are correct\n- yfinance is installed\n- Network connection is working"
+            yield f"❌ **All tickers failed to fetch data:**\n\n" + "\n".join(errors) + "\n\n**Please check:**\n- Ticker symbols are correct\n- yfinance is installed\n- Network connection is working"
+            return
         
         # Add warning for partial failures
         warning = ""
@@ -520,51 +727,42 @@ def analyze_portfolio(portfolio_text):
 
 Follow the complete sentiment analysis framework. Use the market data above along with news from reliable sources to provide comprehensive sentiment analysis."""
         
-        response = team.run(query)
-        result = response.content if hasattr(response, 'content') else str(response)
-        
         # Add header
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        output = f"# 📊 Portfolio Sentiment Analysis\n\n"
-        output += f"**Stocks:** {', '.join(tickers)}\n\n"
-        output += f"**Timestamp:** {timestamp}\n\n"
-        output += warning
-        output += "---\n\n"
-        output += result
-        
-        return output
+        output = "".join([
+            "# 📊 Portfolio Sentiment Analysis\n\n",
+            f"**Stocks:** {', '.join(tickers)}\n\n",
+            f"**Timestamp:** {timestamp}\n\n",
+            warning,
+            "---\n\n",
+        ])
+        yield output
+        
+        # Stream the team lead's response as it is generated
+        async for run_event in team.arun(query, stream=True):
+            if run_event.event == TeamRunEvent.run_content and run_event.content:
+                output += str(run_event.content)
+                yield output
+            elif run_event.event == TeamRunEvent.run_error:
+                # Streaming runs report failures as events rather than raising
+                yield f"{output}\n\n❌ **Error:** {run_event.content}\n\nPlease check your API key and stock tickers, then try again."
+                return
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        return f"❌ **Error:** {str(e)}\n\n**Details:**\n```\n{error_details}\n```\n\nPlease check your API key and stock tickers, then try again."
+        error_details = f"\n\n**Details:**\n```\n{traceback.format_exc()}\n```" if DEBUG else ""
+        yield f"❌ **Error:** {str(e)}{error_details}\n\nPlease check your API key and stock tickers, then try again."
+
+# Initialize agents once at startup so the first request doesn't pay for it
+agent_team = None
+agent_init_error = None
+try:
+    agent_team = initialize_agents()
+except Exception as e:
+    agent_init_error = str(e)
+    print(f"⚠️ Agent initialization failed: {agent_init_error}")
 
 # Create Gradio interface
-with gr.Blocks() as demo:
-    gr.HTML("""
-    <style>
-    .gradio-container {
-        font-family: 'Inter', sans-serif !important;
-        background: linear-gradient(135deg, #0a0a0a 0%, #1a1a2e 100%);
-    }
-    h1 {
-        text-align: center;
-        color: #00ff88 !important;
-        font-weight: 300;
-        letter-spacing: 0.5rem;
-        text-transform: uppercase;
-        margin-bottom: 0.5rem;
-    }
-    .subtitle {
-        text-align: center;
-        color: #888;
-        letter-spacing: 0.2rem;
-        font-size: 0.9rem;
-        margin-bottom: 2rem;
-    }
-    </style>
-    """)
-    
+with gr.Blocks(css_paths=os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")) as demo:
     gr.HTML("<h1>SENTIMENT</h1>")
     gr.HTML("<p class='subtitle'>AI-Powered Portfolio Sentiment Analysis</p>")
     
@@ -572,7 +770,7 @@ with gr.Blocks() as demo:
         with gr.Column(scale=3):
             portfolio_input = gr.Textbox(
                 label="📈 Portfolio Input",
-                placeholder="Enter stock tickers (comma-separated or one per line)\n\nExample: AAPL, MSFT, TSLA",
+                placeholder="Enter stock tickers (separated by commas, spaces, or new lines)\n\nExample: AAPL, MSFT, TSLA",
                 lines=5,
                 max_lines=10
             )
@@ -588,7 +786,7 @@ with gr.Blocks() as demo:
     
     output = gr.Markdown(
         label="Analysis Results",
-        value="Enter stock tickers above and click 'ANALYZE SENTIMENT' to begin.\n\n**Features:**\n- Real-time market data from Yahoo Finance\n- News from verified sources only (Bloomberg, Reuters, WSJ, etc.)\n- Multi-agent AI analysis with Claude Sonnet 4"
+        value="Enter stock tickers above and click 'ANALYZE SENTIMENT' to begin.\n\n**Features:**\n- Real-time market data from Yahoo Finance\n- News from verified sources only (Bloomberg, Reuters, WSJ, etc.)\n- Multi-agent AI analysis with Claude Sonnet 4 and Claude Haiku 4.5"
     )
     
     # Button actions
@@ -645,6 +843,9 @@ with gr.Blocks() as demo:
         - Test with a single ticker first (e.g., AAPL)
         """)
 
+# Let several analyses run at once - handlers are IO-bound on Anthropic and yfinance
+demo.queue(default_concurrency_limit=4, max_size=32)
+
 # Launch the app
 if __name__ == "__main__":
     demo.launch(